@@ -1,6 +1,13 @@
+import array
+import mmap
+import os
+import re
+import stat
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from enum import Enum, auto
-from typing import Tuple, Optional, List
+from typing import Tuple, Optional, Union
 
 class TokenType(Enum):
     KEYWORD = auto()
@@ -14,10 +21,29 @@ class TokenType(Enum):
     EOF = auto()
     UNKNOWN = auto()
 
-KEYWORDS = {
+# Integer tags recorded in the Lexer's packed token arrays.
+_KEYWORD = TokenType.KEYWORD.value
+_IDENTIFIER = TokenType.IDENTIFIER.value
+_INTEGER = TokenType.INTEGER.value
+_REAL = TokenType.REAL.value
+_OPERATOR = TokenType.OPERATOR.value
+_SEPARATOR = TokenType.SEPARATOR.value
+_STRING = TokenType.STRING.value
+_COMMENT = TokenType.COMMENT.value
+_EOF = TokenType.EOF.value
+_UNKNOWN = TokenType.UNKNOWN.value
+
+# Output name for each tag, so writing a token never touches the Enum.
+_TOK_NAME = [""] * (max(t.value for t in TokenType) + 1)
+for _t in TokenType:
+    _TOK_NAME[_t.value] = _t.name.lower()
+
+KEYWORDS = frozenset({
     "while", "if", "else", "for", "int", "float", "bool", "true", "false",
     "function", "return", "read", "write", "then", "fi", "do", "od"
-}
+})
+_KEYWORD_BYTES = frozenset(k.encode("ascii") for k in KEYWORDS)
+_MAX_KEYWORD_LEN = max(len(k) for k in KEYWORDS)
 
 SEPARATORS = {
     "(", ")", "{", "}", "[", "]", ",", ";", ":"
@@ -26,63 +52,136 @@ SEPARATORS = {
 MULTI_CHAR_OPS = {"<=", ">=", "==", "!=", "&&", "||"}
 SINGLE_CHAR_OPS = {"+", "-", "*", "/", "%", "=", "<", ">", "!"}
 
-def is_letter(ch: str) -> bool:
-    return ch.isalpha()
-
-def is_digit(ch: str) -> bool:
-    return ch.isdigit()
-
-def is_alnum(ch: str) -> bool:
-    return ch.isalnum()
+# Per-byte operator/separator kinds. The first character alone decides the
+# token unless it can start a two-character operator, in which case only
+# the second character is checked ('=' after <>=!, a repeat of & or |).
+_OP_SINGLE, _OP_SEP, _OP_MAYBE_EQ, _OP_MAYBE_PAIR = 1, 2, 3, 4
+_OP_KIND = bytearray(256)
+for _ch in SINGLE_CHAR_OPS:
+    _OP_KIND[ord(_ch)] = _OP_SINGLE
+for _ch in SEPARATORS:
+    _OP_KIND[ord(_ch)] = _OP_SEP
+for _op in MULTI_CHAR_OPS:
+    _OP_KIND[ord(_op[0])] = _OP_MAYBE_EQ if _op[1] == "=" else _OP_MAYBE_PAIR
+_OP_KIND = bytes(_OP_KIND)
+
+# Non-ASCII characters str.isspace() accepts (all in the BMP), as UTF-8
+# byte sequences.
+_UNICODE_SPACES = [chr(c).encode("utf-8") for c in range(0x80, 0x10000)
+                   if chr(c).isspace()]
+
+# Per-byte character classes, computed once. Letters and digits are
+# ASCII-only, matching the patterns below. _SPACE marks ASCII whitespace
+# and the lead bytes of the non-ASCII whitespace sequences.
+_DIGIT, _LETTER, _SPACE = 1, 2, 4
+_CLS = bytes(
+    (_DIGIT if 0x30 <= b <= 0x39 else 0)
+    | (_LETTER if 0x41 <= b <= 0x5A or 0x61 <= b <= 0x7A else 0)
+    | (_SPACE if (b < 128 and chr(b).isspace())
+       or any(seq[0] == b for seq in _UNICODE_SPACES) else 0)
+    for b in range(256)
+)
+
+# Length of the UTF-8 sequence introduced by each lead byte (1 for ASCII and
+# for bytes that cannot start a sequence).
+_UTF8_LEN = bytes(
+    2 if 0xC0 <= b <= 0xDF else 3 if 0xE0 <= b <= 0xEF else
+    4 if 0xF0 <= b <= 0xF7 else 1
+    for b in range(256)
+)
+
+_SLASH, _STAR, _DOT, _ZERO, _EQUALS, _QUOTE = b'/*.0="'
+
+# One compiled pattern per token class (block comments end via bytes.find).
+# Each is the regex form of the DFA documented on the matching Lexer method
+# and runs as a single left-to-right pass inside the C regex engine. The
+# lookaheads keep the original "reject instead of accepting a shorter prefix"
+# behaviour (e.g. `12.` or `1.5e`). '\r' ends a line like '\n' does, as it
+# would after text-mode newline translation.
+_ASCII_WS_RE = re.compile(rb"[\s\x1c-\x1f]*")
+_WS_RE = re.compile(
+    rb"(?:[\s\x1c-\x1f]|"
+    + b"|".join(re.escape(seq) for seq in _UNICODE_SPACES) + rb")*")
+_NON_ASCII_RE = re.compile(rb"[\x80-\xff]")
+_LINE_COMMENT_RE = re.compile(rb"//[^\r\n]*")
+_IDENT_RE = re.compile(rb"[A-Za-z][A-Za-z0-9_]*")
+_DIGITS_RE = re.compile(rb"[0-9]*")
+_FRACTION_RE = re.compile(rb"\.[0-9]+(?![0-9])(?:[eE][+-]?[0-9]+|(?![eE]))")
+_STRING_RE = re.compile(rb'"[^"\r\n]*"?')
 
 class Lexer:
-    def __init__(self, text: str):
-        self.text = text
+    def __init__(self, text: Union[str, bytes, mmap.mmap]):
+        # The lexer works on UTF-8 bytes. A str is encoded once; bytes or an
+        # mmap are scanned in place, and lexemes are only decoded by
+        # lexeme().
+        if isinstance(text, str):
+            self._ascii = text.isascii()
+            text = text.encode("ascii" if self._ascii else "utf-8")
+        elif isinstance(text, bytes):
+            self._ascii = text.isascii()
+        else:
+            self._ascii = _NON_ASCII_RE.search(text) is None
+        self.buf = text
+
+        # Rat25F source is normally pure ASCII; in that case every character
+        # is one byte and the only whitespace is ASCII, so bind the simpler
+        # variants once here instead of handling UTF-8 on every call.
+        if self._ascii:
+            self._ws_re = _ASCII_WS_RE
+            self._unknown = self._unknown_ascii
+        else:
+            self._ws_re = _WS_RE
+            self._unknown = self._unknown_utf8
         self.i = 0
         self.n = len(text)
-
-    def peek(self, k: int = 0) -> str:
-        idx = self.i + k
-        if idx < self.n:
-            return self.text[idx]
-        return ""
-
-    def advance(self, steps: int = 1) -> None:
-        self.i += steps
-
-    def eof(self) -> bool:
-        return self.i >= self.n
+        # Tokens are stored as parallel (tag, start, end) arrays rather than
+        # (TokenType, str) tuples; lexemes are sliced only by lexeme().
+        # Offsets are byte offsets into buf.
+        self._tags = array.array("B")
+        self._starts = array.array("q")
+        self._ends = array.array("q")
+
+        # First-byte jump table: in Rat25F the token class is fixed by the
+        # first non-whitespace character, so each token needs one lookup.
+        self._dispatch = [self._unknown] * 256
+        for c in range(256):
+            if _CLS[c] & _DIGIT:
+                self._dispatch[c] = self.lex_number
+            elif _CLS[c] & _LETTER:
+                self._dispatch[c] = self.lex_identifier
+            elif _OP_KIND[c]:
+                self._dispatch[c] = self.lex_operator_or_separator
+        self._dispatch[_QUOTE] = self.lex_string
+        self._dispatch[_SLASH] = self._slash
 
     def skip_whitespace(self):
-        while not self.eof() and self.peek().isspace():
-            self.advance()
+        # Most tokens are not preceded by whitespace; skip the regex call then.
+        i = self.i
+        if i < self.n and _CLS[self.buf[i]] & _SPACE:
+            self.i = self._ws_re.match(self.buf, i).end()
 
-    def skip_comments(self) -> Optional[Tuple[TokenType, str]]:
+    def skip_comments(self) -> Optional[int]:
         """
         Handles // line comments and /* ... */ block comments.
-        Returns a COMMENT token tuple if a full comment is consumed,
+        Returns the COMMENT tag if a full comment is consumed,
         otherwise None (no comment at current position).
         """
-        if self.peek() == "/" and self.peek(1) == "/":
-            start = self.i
-            while not self.eof() and self.peek() != "\n":
-                self.advance()
-            lexeme = self.text[start:self.i]
-            return (TokenType.COMMENT, lexeme)
-
-        if self.peek() == "/" and self.peek(1) == "*":
-            start = self.i
-            self.advance(2) 
-            while not self.eof() and not (self.peek() == "*" and self.peek(1) == "/"):
-                self.advance()
-            if not self.eof():
-                self.advance(2) 
-            lexeme = self.text[start:self.i]
-            return (TokenType.COMMENT, lexeme)
-
-        return None
+        buf = self.buf
+        start = self.i
+        if start + 1 >= self.n or buf[start] != _SLASH:
+            return None
+        second = buf[start + 1]
+        if second == _SLASH:
+            end = _LINE_COMMENT_RE.match(buf, start).end()
+        elif second == _STAR:
+            end = buf.find(b"*/", start + 2)
+            end = end + 2 if end >= 0 else self.n
+        else:
+            return None
+        self.i = end
+        return _COMMENT
 
-    def lex_identifier(self) -> Optional[Tuple[TokenType, str]]:
+    def lex_identifier(self) -> Optional[int]:
         """
         IDENTIFIER DFA (explicit):
           State S0: if letter -> S1 else reject
@@ -90,191 +189,170 @@ class Lexer:
           Accepting state: S1
         Note: First char must be a letter. After that, underscores allowed.
         """
-        if not is_letter(self.peek()):
+        m = _IDENT_RE.match(self.buf, self.i)
+        if m is None:
             return None
-
-        start = self.i
-        self.advance()
-        while not self.eof():
-            ch = self.peek()
-            if is_alnum(ch) or ch == "_":
-                self.advance()
-            else:
-                break
-
-        lexeme = self.text[start:self.i]
-        if lexeme in KEYWORDS:
-            return (TokenType.KEYWORD, lexeme)
-        return (TokenType.IDENTIFIER, lexeme)
-
-    def lex_integer(self) -> Optional[Tuple[TokenType, str]]:
-        """
-        INTEGER DFA (explicit):
-          Regex: 0 | [1-9][0-9]*
-          States:
-            S0: if '0' -> accept '0' (S1), else if [1-9] -> S2, else reject
-            S2: while digit -> stay S2
-          Accepting states: S1, S2
-        """
-        if not is_digit(self.peek()):
-            return None
-
         start = self.i
+        self.i = end = m.end()
 
-        if self.peek() == "0":
-            self.advance()
-            if self.peek() != ".":
-                return (TokenType.INTEGER, self.text[start:self.i])
-            else:
-                self.i = start
-                return None
+        # Only names short enough to be a keyword are sliced and looked up.
+        if end - start <= _MAX_KEYWORD_LEN and self.buf[start:end] in _KEYWORD_BYTES:
+            return _KEYWORD
+        return _IDENTIFIER
 
-        if self.peek() in "123456789":
-            self.advance()
-            while not self.eof() and is_digit(self.peek()):
-                self.advance()
-            if self.peek() == ".":
-                self.i = start
-                return None
-            return (TokenType.INTEGER, self.text[start:self.i])
-
-        return None
-
-    def lex_real(self) -> Optional[Tuple[TokenType, str]]:
+    def lex_number(self) -> Optional[int]:
         """
-        REAL DFA (explicit, simplified):
-          Regex (simplified):  [0-9]+ '.' [0-9]+ ( [eE] [+-]? [0-9]+ )?
-          Strategy: parse integral part, dot, fractional part, optional exponent.
-
-          This requires at least one digit before and after the dot.
+        NUMBER DFA (explicit, INTEGER and REAL fused into one forward pass):
+          INTEGER regex: 0 | [1-9][0-9]*
+          REAL regex (simplified): [0-9]+ '.' [0-9]+ ( [eE] [+-]? [0-9]+ )?
+          States:
+            S0: digit -> S1 (digit run, scanned once)
+            S1: if '.' -> try fraction/exponent; accept REAL on success
+                otherwise accept INTEGER ('0' alone if the run starts with 0)
+          An INTEGER directly followed by '.' is rejected, as is a REAL with
+          no fractional digits or an empty exponent.
         """
+        buf = self.buf
+        n = self.n
         start = self.i
-        i0 = self.i
-
-        # integral digits (>=1)
-        if not is_digit(self.peek()):
+        end = _DIGITS_RE.match(buf, start).end()
+        if end == start:
             return None
-        while not self.eof() and is_digit(self.peek()):
-            self.advance()
 
-        if self.peek() != ".":
-            self.i = i0
-            return None
-        self.advance()  
+        if end < n and buf[end] == _DOT:
+            m = _FRACTION_RE.match(buf, end)
+            if m is not None:
+                self.i = m.end()
+                return _REAL
 
-        # fractional digits (>=1)
-        if not is_digit(self.peek()):
-            self.i = i0
+        if buf[start] == _ZERO:
+            end = start + 1
+        if end < n and buf[end] == _DOT:
             return None
-        while not self.eof() and is_digit(self.peek()):
-            self.advance()
-
-        if self.peek() in ("e", "E"):
-            self.advance()
-            if self.peek() in ("+", "-"):
-                self.advance()
-            if not is_digit(self.peek()):
-                self.i = i0
-                return None
-            while not self.eof() and is_digit(self.peek()):
-                self.advance()
+        self.i = end
+        return _INTEGER
 
-        return (TokenType.REAL, self.text[start:self.i])
-
-    def lex_string(self) -> Optional[Tuple[TokenType, str]]:
-        if self.peek() != '"':
+    def lex_string(self) -> Optional[int]:
+        m = _STRING_RE.match(self.buf, self.i)
+        if m is None:
             return None
-        start = self.i
-        self.advance() 
-        while not self.eof() and self.peek() != '"':
-            if self.peek() == "\n":
-                break
-            self.advance()
-        if self.peek() == '"':
-            self.advance()  
-        return (TokenType.STRING, self.text[start:self.i])
-
-    def lex_operator_or_separator(self) -> Optional[Tuple[TokenType, str]]:
-        two = self.peek() + self.peek(1)
-        if two in MULTI_CHAR_OPS:
-            tok = (TokenType.OPERATOR, two)
-            self.advance(2)
-            return tok
-
-        ch = self.peek()
-        if ch in SINGLE_CHAR_OPS:
-            tok = (TokenType.OPERATOR, ch)
-            self.advance()
-            return tok
-
-        if ch in SEPARATORS:
-            tok = (TokenType.SEPARATOR, ch)
-            self.advance()
-            return tok
+        self.i = m.end()
+        return _STRING
+
+    def lex_operator_or_separator(self) -> Optional[int]:
+        buf = self.buf
+        i = self.i
+        c = buf[i]
+        kind = _OP_KIND[c]
+        has_next = i + 1 < self.n
+
+        if kind == _OP_MAYBE_EQ:
+            self.i = i + 2 if has_next and buf[i + 1] == _EQUALS else i + 1
+            return _OPERATOR
+        if kind == _OP_MAYBE_PAIR:
+            if not has_next or buf[i + 1] != c:
+                return None
+            self.i = i + 2
+            return _OPERATOR
+        if kind == _OP_SINGLE:
+            self.i = i + 1
+            return _OPERATOR
+        if kind == _OP_SEP:
+            self.i = i + 1
+            return _SEPARATOR
 
         return None
 
-    def next_token(self) -> Tuple[TokenType, str]:
-        while not self.eof():
-            self.skip_whitespace()
-
-            com = self.skip_comments()
-            if com:
-                return com
-
-            if self.eof():
-                break
+    def _slash(self) -> Optional[int]:
+        # '/' starts either a comment or the division operator.
+        return self.skip_comments() or self.lex_operator_or_separator()
 
-           
-            for fn in (self.lex_real, self.lex_integer, self.lex_identifier, self.lex_string, self.lex_operator_or_separator):
-                here = self.i
-                tok = fn()
-                if tok is not None:
-                    return tok
-                else:
-                    self.i = here 
+    def _unknown_ascii(self) -> int:
+        self.i += 1
+        return _UNKNOWN
 
-            ch = self.peek()
-            self.advance()
-            return (TokenType.UNKNOWN, ch)
+    def _unknown_utf8(self) -> int:
+        # One whole character, so a multi-byte UTF-8 sequence stays together.
+        self.i = min(self.i + _UTF8_LEN[self.buf[self.i]], self.n)
+        return _UNKNOWN
 
-        return (TokenType.EOF, "")
+    def next_token(self) -> int:
+        """
+        Lexes one token, appends it to the packed token arrays and returns
+        its tag (a TokenType value). At end of input nothing is appended and
+        the EOF tag is returned.
+        """
+        self.skip_whitespace()
+        start = self.i
+        if start >= self.n:
+            return _EOF
+
+        # A handler may still reject (e.g. "12." or a lone "&").
+        tag = self._dispatch[self.buf[start]]() or self._unknown()
+
+        self._tags.append(tag)
+        self._starts.append(start)
+        self._ends.append(self.i)
+        return tag
+
+    def tokenize(self) -> int:
+        """Lexes the rest of the input; returns the total number of tokens."""
+        while self.next_token() != _EOF:
+            pass
+        return len(self._tags)
+
+    def materialize(self, idx: int) -> Tuple[TokenType, str]:
+        """Returns token idx as a (TokenType, lexeme) pair."""
+        return (TokenType(self._tags[idx]), self.lexeme(idx))
+
+    def lexeme(self, idx: int) -> str:
+        """Returns the decoded source text of token idx."""
+        return self.buf[self._starts[idx]:self._ends[idx]].decode("utf-8")
+
+def _map_input(f):
+    """
+    Maps the open binary file f read-only. mmap cannot map an empty file or
+    a non-regular one (pipe, /dev/stdin, process substitution), which also
+    reports size 0, so those are read into bytes instead.
+    """
+    st = os.fstat(f.fileno())
+    if not stat.S_ISREG(st.st_mode):
+        return nullcontext(f.read())
+    if st.st_size == 0:
+        return nullcontext(b"")
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
 def lex_file(in_path: str, out_path: str) -> None:
-    with open(in_path, "r", encoding="utf-8") as f:
-        text = f.read()
-
-    lx = Lexer(text)
-    rows: List[Tuple[str, str]] = []
-
-    while True:
-        tok, lex = lx.next_token()
-        if tok == TokenType.EOF:
-            break
-        
-        if tok == TokenType.COMMENT:
-            
-            continue
-        rows.append((tok.name.lower(), lex))
+    with open(in_path, "rb") as f, _map_input(f) as buf:
+        lx = Lexer(buf)
+        lx.tokenize()
+
+        lexeme = lx.lexeme
+        body = "".join(f"{_TOK_NAME[tag]:<15} {lexeme(idx)}\n"
+                       for idx, tag in enumerate(lx._tags) if tag != _COMMENT)
 
     # Write output
-    with open(out_path, "w", encoding="utf-8") as out:
+    with open(out_path, "w", encoding="utf-8", buffering=1 << 20) as out:
         out.write(f"{'token':<15} {'lexeme'}\n")
         out.write("-" * 40 + "\n")
-        for t, l in rows:
-            out.write(f"{t:<15} {l}\n")
+        out.write(body)
 
 if __name__ == "__main__":
-    import os
     if len(sys.argv) == 3:
         lex_file(sys.argv[1], sys.argv[2])
     else:
         tests_dir = os.path.join(os.path.dirname(__file__), "tests")
         os.makedirs(tests_dir, exist_ok=True)
+        in_files, out_files = [], []
         for i in range(1, 4):
             in_f = os.path.join(tests_dir, f"test{i}.rat")
             out_f = os.path.join(tests_dir, f"test{i}.out.txt")
             if os.path.exists(in_f):
-                lex_file(in_f, out_f)
+                in_files.append(in_f)
+                out_files.append(out_f)
+        # Files are independent and lexing is CPU-bound under the GIL, so
+        # each file is lexed in its own worker process.
+        with ProcessPoolExecutor() as ex:
+            for out_f, _ in zip(out_files, ex.map(lex_file, in_files, out_files)):
                 print(f"Wrote {out_f}")
         print("Done demo.")